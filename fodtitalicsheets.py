@@ -13,14 +13,19 @@
 
 import argparse
 import base64
+import collections
 import datetime
-from decimal import Decimal
+from decimal import Decimal, DefaultContext, InvalidOperation, localcontext
 import math
 import os.path
+import re
 import sys
+import xml.etree.ElementTree as ET
 
-parser = argparse.ArgumentParser(description="Combine images of Italic calligraphy practice sheets into a single OpenDocument file.  Note that this program does not verify that the specified images will fit and retain their aspect ratios within the specified page dimensions: You must verify that yourself.  The generated flat OpenDocument file is printed on standard output.")
+parser = argparse.ArgumentParser(description="Combine images of Italic calligraphy practice sheets into a single OpenDocument file.  Before generating anything, this program reads the beginning of each image and verifies that the image's page dimensions (as recorded by svgitalicsheet.py and the other generators) and aspect ratio match the page minus its margins (see -e and -n).  The generated flat OpenDocument file is printed on standard output.")
 parser.add_argument("-d", "--description", default="", help="""description of the file (added before the public domain dedication [see -p], if any; default is blank)""")
+parser.add_argument("-e", "--tolerance", type=Decimal, default=Decimal('0.1'), help="""the largest allowed difference between an image's dimensions and the page's dimensions minus margins, in mm regardless of -u (default: 0.1)""")
+parser.add_argument("-n", "--no-verify", action="store_true", default=False, help="""don't verify that the images' dimensions match the page's dimensions minus margins""")
 parser.add_argument("-p", "--public-domain-dedication", metavar="AUTHOR", default=None, help="""add a Creative Commons CC0 Public Domain Dedication to the generated image using the specified AUTHOR""")
 parser.add_argument("-t", "--title", default="Italic Calligraphy Practice Sheets", help="""the document's title in its metadata (default: "Italic Calligraphy Practice Sheets")""")
 parser.add_argument("-u", "--units", default="mm", help="""units used for page and margin dimensions (can be any unit suffix recognized by the OpenDocument standard; default: mm)""")
@@ -29,51 +34,147 @@ parser.add_argument("height", type=Decimal, help="""the height of the page""")
 parser.add_argument("margin", type=Decimal, help="""the width of page margins""")
 parser.add_argument("sheetimage", nargs="+", help="""a list of SVG images of Italic calligraphy practice sheets""")
 
-errors = False
-def error(message):
-	global errors
-	sys.stderr.write(os.path.basename(sys.argv[0]) + ": error: " + message + "\n")
-	errors = True
+units_in_mm = {"mm": Decimal(1), "cm": Decimal(10), "m": Decimal(1000), "km": Decimal(1000000), "pt": Decimal('25.4') / 72, "pc": Decimal('25.4') / 6, "inch": Decimal('25.4'), "ft": Decimal('304.8'), "mi": Decimal(1609344)}
 
-if __name__ == "__main__":
+svg_namespace = "{http://www.w3.org/2000/svg}"
+page_size_re = re.compile(r"formatted for a (\S+)mm x (\S+)mm page")
+header_chunk_size = 4096
+max_header_size = 65536
+
+# The parameters of a document, in the units of the command-line arguments.
+# generate() never modifies them.
+Document = collections.namedtuple("Document", ["description", "tolerance", "no_verify", "public_domain_dedication", "title", "units", "width", "height", "margin", "sheetimage"])
+
+def document_from_args(args):
+	return Document(**{field: tuple(args.sheetimage) if field == "sheetimage" else getattr(args, field) for field in Document._fields})
+
+# Raised by generate() for an invalid Document or images that don't fit its
+# pages.
+class DocumentError(Exception):
+	def __init__(self, messages):
+		super().__init__("; ".join(messages))
+		self.messages = messages
+
+def validate(document):
+	messages = []
+	if document.width <= 0:
+		messages.append("width must be positive")
+	if document.height <= 0:
+		messages.append("height must be positive")
+	if document.margin < 0:
+		messages.append("margin must be positive or zero")
+	if document.margin > document.width * Decimal(0.5):
+		messages.append("margin exceeds horizontal page dimensions (i.e., it's too large!)")
+	if document.margin > document.height * Decimal(0.5):
+		messages.append("margin exceeds vertical page dimensions (i.e., it's too large!)")
+	if document.units not in units_in_mm:
+		messages.append("unrecognized units: must be one of mm, cm, m, km, pt, pc, inch, ft, or mi")
+	if not document.tolerance.is_finite():
+		messages.append("tolerance must be a finite number")
+	elif document.tolerance < 0:
+		messages.append("tolerance cannot be negative")
+	return messages
+
+# Read just enough of the SVG image at path to get its root element's
+# attributes and its description, which is at the top of every image that our
+# generators write.  Returns (width, height, description); the description is
+# None if the image doesn't have one.  Raises DocumentError if the image can't
+# be read.
+def read_svg_header(path):
+	pullparser = ET.XMLPullParser(events=("start", "end"))
+	root = None
+	size = 0
 	try:
-		args = parser.parse_args()
-	except Exception:
-		error("invalid command line arguments (invalid syntax?)")
-		sys.exit(1)
+		with open(path, "rb") as imgfile:
+			while size < max_header_size:
+				chunk = imgfile.read(header_chunk_size)
+				if not chunk:
+					break
+				size += len(chunk)
+				pullparser.feed(chunk)
+				for event, element in pullparser.read_events():
+					if root is None:
+						root = element
+						if root.tag != svg_namespace + "svg":
+							raise DocumentError([path + " is not an SVG image"])
+					elif event == "end" and element.tag == svg_namespace + "desc":
+						return (root.get("width"), root.get("height"), element.text or "")
+					elif event == "start" and element.tag not in {svg_namespace + "title", svg_namespace + "desc"}:
+						return (root.get("width"), root.get("height"), None)
+	except OSError as e:
+		raise DocumentError(["unable to read " + path + ": " + e.strerror])
+	except ET.ParseError as e:
+		raise DocumentError([path + " is not a valid SVG image: " + str(e)])
+	if root is None:
+		raise DocumentError([path + " is not an SVG image"])
+	return (root.get("width"), root.get("height"), None)
 
-	if args.width <= 0:
-		error("width must be positive")
-	if args.height <= 0:
-		error("height must be positive")
-	if args.margin < 0:
-		error("margin must be positive or zero")
-	if args.margin > args.width * Decimal(0.5):
-		error("margin exceeds horizontal page dimensions (i.e., it's too large!)")
-	if args.margin > args.height * Decimal(0.5):
-		error("margin exceeds vertical page dimensions (i.e., it's too large!)")
-	if args.units not in {"mm", "cm", "m", "km", "pt", "pc", "inch", "ft", "mi"}:
-		error("unrecognized units: must be one of mm, cm, m, km, pt, pc, inch, ft, or mi")
-	if errors:
-		sys.exit(1)
-	if not args.sheetimage:
-		sys.exit(0)
+# Verify that the SVG image at path was formatted for a page whose dimensions
+# minus margins are imgwidth x imgheight (in units) and that its aspect ratio
+# matches.  The tolerance is in mm, like the dimensions in the description.
+# Returns a message describing the problem or None if there is none.
+def verify_image(path, imgwidth, imgheight, units, tolerance):
+	try:
+		width, height, desc = read_svg_header(path)
+	except DocumentError as e:
+		return e.messages[0]
+	try:
+		width = Decimal(width)
+		height = Decimal(height)
+	except (InvalidOperation, TypeError):
+		return path + " has a missing or invalid width or height (must be a plain number)"
+	if not width.is_finite() or not height.is_finite():
+		return path + " has an invalid width or height (must be a finite number)"
+	if width <= 0 or height <= 0:
+		return path + " has a zero or negative width or height"
+	match = page_size_re.search(desc) if desc else None
+	if not match:
+		return path + " doesn't specify its page dimensions (was it generated by svgitalicsheet.py?)"
+	try:
+		pagewidth = Decimal(match.group(1))
+		pageheight = Decimal(match.group(2))
+	except InvalidOperation:
+		return path + " has invalid page dimensions in its description"
+	if not pagewidth.is_finite() or not pageheight.is_finite():
+		return path + " has invalid page dimensions in its description (must be finite numbers)"
+	imgwidth_mm = imgwidth * units_in_mm[units]
+	imgheight_mm = imgheight * units_in_mm[units]
+	if abs(pagewidth - imgwidth_mm) > tolerance or abs(pageheight - imgheight_mm) > tolerance:
+		return "{0} is formatted for a {1}mmx{2}mm page but the page minus margins is {3}mmx{4}mm".format(path, pagewidth, pageheight, imgwidth_mm, imgheight_mm)
+	if abs(height * imgwidth_mm / width - imgheight_mm) > tolerance:
+		return "{0}'s aspect ratio ({1}x{2}) doesn't match the page minus margins ({3}mmx{4}mm)".format(path, width, height, imgwidth_mm, imgheight_mm)
+	return None
+
+# Write document as a flat OpenDocument text file to out.  Returns messages
+# about images that couldn't be embedded.
+def generate(document, out):
+	messages = validate(document)
+	if messages:
+		raise DocumentError(messages)
+	if not document.sheetimage:
+		return []
 
-	imgwidth = args.width - 2 * args.margin
-	imgheight = args.height - 2 * args.margin
-	now = datetime.datetime.today()
-	sys.stdout.write("""<?xml version="1.0" encoding="UTF-8" standalone="no"?>
+	with localcontext(DefaultContext):
+		imgwidth = document.width - 2 * document.margin
+		imgheight = document.height - 2 * document.margin
+		if not document.no_verify:
+			messages = [message for message in (verify_image(path, imgwidth, imgheight, document.units, document.tolerance) for path in document.sheetimage) if message]
+			if messages:
+				raise DocumentError(messages)
+
+		now = datetime.datetime.today()
+		out.write("""<?xml version="1.0" encoding="UTF-8" standalone="no"?>
 <office:document xmlns:office="urn:oasis:names:tc:opendocument:xmlns:office:1.0" xmlns:style="urn:oasis:names:tc:opendocument:xmlns:style:1.0" xmlns:text="urn:oasis:names:tc:opendocument:xmlns:text:1.0" xmlns:draw="urn:oasis:names:tc:opendocument:xmlns:drawing:1.0" xmlns:fo="urn:oasis:names:tc:opendocument:xmlns:xsl-fo-compatible:1.0" xmlns:xlink="http://www.w3.org/1999/xlink" xmlns:dc="http://purl.org/dc/elements/1.1/" xmlns:meta="urn:oasis:names:tc:opendocument:xmlns:meta:1.0" xmlns:svg="urn:oasis:names:tc:opendocument:xmlns:svg-compatible:1.0" office:version="1.2" office:mimetype="application/vnd.oasis.opendocument.text">
 	<office:meta>
 		<meta:creation-date>{0}</meta:creation-date>
-		<dc:description>{1}Pages are {2}{5}x{3}{5} with {4}{5} margins.""".format(now.strftime("%FT%TZ"), "{0}\n\n".format(args.description) if args.description else "", args.width, args.height, args.margin, args.units))
-	if args.public_domain_dedication:
-		sys.stdout.write("""
+		<dc:description>{1}Pages are {2}{5}x{3}{5} with {4}{5} margins.""".format(now.strftime("%FT%TZ"), "{0}\n\n".format(document.description) if document.description else "", document.width, document.height, document.margin, document.units))
+		if document.public_domain_dedication:
+			out.write("""
 
 Created on {0} by {1}.
 
-To the extent possible under law, {1} has waived all copyright and related or neighboring rights to this image.  You can copy, modify, distribute and perform this image, even for commercial purposes, all without asking permission.  Please see &lt;http://creativecommons.org/publicdomain/zero/1.0/&gt; for more information.""".format(now.strftime("%F"), args.public_domain_dedication.strip()))
-	sys.stdout.write("""</dc:description>
+To the extent possible under law, {1} has waived all copyright and related or neighboring rights to this image.  You can copy, modify, distribute and perform this image, even for commercial purposes, all without asking permission.  Please see &lt;http://creativecommons.org/publicdomain/zero/1.0/&gt; for more information.""".format(now.strftime("%F"), document.public_domain_dedication.strip()))
+		out.write("""</dc:description>
 		<dc:title>{0}</dc:title>
 		<dc:date>{1}</dc:date>
 	</office:meta>
@@ -98,26 +199,46 @@ To the extent possible under law, {1} has waived all copyright and related or ne
 		<style:master-page style:name="Standard" style:page-layout-name="pm1"/>
 	</office:master-styles>
 	<office:body>
-		<office:text>\n""".format(args.title, now.strftime("%FT%TZ"), args.width, args.height, args.margin, args.units))
-
-	def add_image(path, imgno, paragraph_style):
-		sys.stdout.write("""			<text:p text:style-name="{0}"><draw:frame draw:style-name="fr1" draw:name="n{1}" text:anchor-type="paragraph" svg:width="{2}{4}" svg:height="{3}{4}" draw:z-index="0"><draw:image><office:binary-data>""".format(paragraph_style, imgno, imgwidth, imgheight, args.units))
-		data = None
-		try:
-			with open(path, "rb") as imgfile:
-				data = imgfile.read()
-		except OSError as e:
-			error("unable to read " + path + ": " + e.strerror)
-		if data:
-			sys.stdout.write(str(base64.b64encode(data), encoding="UTF-8"))
-		sys.stdout.write("""</office:binary-data></draw:image></draw:frame></text:p>\n""")
-	for index, path in enumerate(args.sheetimage):
-		add_image(path, index, "Standard" if index is 0 else "P1")
-
-	sys.stdout.write("""		</office:text>
+		<office:text>\n""".format(document.title, now.strftime("%FT%TZ"), document.width, document.height, document.margin, document.units))
+
+		def add_image(path, imgno, paragraph_style):
+			out.write("""			<text:p text:style-name="{0}"><draw:frame draw:style-name="fr1" draw:name="n{1}" text:anchor-type="paragraph" svg:width="{2}{4}" svg:height="{3}{4}" draw:z-index="0"><draw:image><office:binary-data>""".format(paragraph_style, imgno, imgwidth, imgheight, document.units))
+			data = None
+			try:
+				with open(path, "rb") as imgfile:
+					data = imgfile.read()
+			except OSError as e:
+				messages.append("unable to read " + path + ": " + e.strerror)
+			if data:
+				out.write(str(base64.b64encode(data), encoding="UTF-8"))
+			out.write("""</office:binary-data></draw:image></draw:frame></text:p>\n""")
+		for index, path in enumerate(document.sheetimage):
+			add_image(path, index, "Standard" if index == 0 else "P1")
+
+		out.write("""		</office:text>
 	</office:body>
 </office:document>\n""")
 
-	if errors:
+	return messages
+
+def error(message):
+	sys.stderr.write(os.path.basename(sys.argv[0]) + ": error: " + message + "\n")
+
+if __name__ == "__main__":
+	try:
+		args = parser.parse_args()
+	except Exception:
+		error("invalid command line arguments (invalid syntax?)")
+		sys.exit(1)
+
+	try:
+		messages = generate(document_from_args(args), sys.stdout)
+	except DocumentError as e:
+		for message in e.messages:
+			error(message)
+		sys.exit(1)
+	for message in messages:
+		error(message)
+	if messages:
 		sys.exit(2)
 
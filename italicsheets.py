@@ -14,48 +14,25 @@
 # <http://creativecommons.org/publicdomain/zero/1.0/>.
 
 import argparse
+import collections
+from concurrent.futures import ThreadPoolExecutor
 import csv
-from decimal import Decimal, InvalidOperation, getcontext
+from decimal import Decimal, InvalidOperation, localcontext
+import json
 import os.path
-import subprocess
 import sys
+import threading
+import time
+
+import fodtitalicsheets
+import svgitalicsheet
 
 default_description_format = ""
 default_svg_filename_format = "italic-sheet-{nibwidth}mm-5degrees-5-5-5-7.{papersize}.svg"
 default_fodt_filename_format = "italic-sheets-5degrees-5-5-5-7.{papersize}.fodt"
 default_title_format = "Italic Calligraphy Practice Sheets ({papersize})"
 
-errors = False
-def error(message):
-	global errors
-	sys.stderr.write(os.path.basename(sys.argv[0]) + ": error: " + message + "\n")
-	errors = True
-
-def field_to_decimal(lineno, fieldno, field):
-	try:
-		return Decimal(field)
-	except InvalidOperation as e:
-		error("{0}: field {1} is not a number".format(lineno, fieldno))
-		return Decimal(0)
-
-class Paper(object):
-	def __init__(self, lineno, width, height, margin, name):
-		self.width = field_to_decimal(lineno, 1, width)
-		self.height = field_to_decimal(lineno, 2, height)
-		self.margin = field_to_decimal(lineno, 3, margin)
-		self.name = name
-		if self.width <= 0:
-			error("{0}: width must be positive".format(lineno))
-		if self.height <= 0:
-			error("{0}: height must be positive".format(lineno))
-		if self.margin < 0:
-			error("{0}: margin must be positive or zero".format(lineno))
-		if self.margin > self.width * Decimal(0.5):
-			error("{0}: margin exceeds horizontal page dimensions (i.e., it's too large!)".format(lineno))
-		if self.margin > self.height * Decimal(0.5):
-			error("{0}: margin exceeds vertical page dimensions (i.e., it's too large!)".format(lineno))
-
-parser = argparse.ArgumentParser(description="Generate SVG images of Italic calligraphy practice sheets and combine them into flat OpenDocument text files.  The dimensions and margins of each document's pages are read in tab-separated value (TSV) format from standard input, one page size per line.  Each line has four fields: page width in mm, page height in mm, margin in mm, and a nickname for the page type (e.g., letter or a4).  This program will generate a set of SVG images and an OpenDocument text file for each page size.")
+parser = argparse.ArgumentParser(description="Generate SVG images of Italic calligraphy practice sheets and combine them into flat OpenDocument text files.  The dimensions and margins of each document's pages are read in tab-separated value (TSV) format from standard input, one page size per line.  Each line has four fields: page width in mm, page height in mm, margin in mm, and a nickname for the page type (e.g., letter or a4).  This program will generate a set of SVG images and an OpenDocument text file for each page size.  In streaming mode (see -S), each page size is processed as soon as its line arrives and a JSON result record is printed on standard output for each generated file.")
 parser.add_argument("-x", "--x-height", type=Decimal, default=Decimal(5), help="""set the x-height (distance between the baseline and the waistline) in nib widths (default is 5)""")
 parser.add_argument("-c", "--cap-height", type=Decimal, default=Decimal(7), help="""set the cap height in nib widths (default is 7)""")
 parser.add_argument("-a", "--ascender-height", type=Decimal, default=Decimal(5), help="""set the ascender height in nib widths (default is 5)""")
@@ -63,9 +40,11 @@ parser.add_argument("-d", "--descender-height", type=Decimal, default=Decimal(5)
 parser.add_argument("-l", "--pen-ladder", action="store_true", default=False, help="""add a pen ladder to each line""")
 parser.add_argument("-s", "--slant-angle", type=Decimal, default=Decimal(90), help="""Generate slant guide lines with the specified angle from vertical in degrees, each separated by the box width (-w) (default is 90, which disables slant guide lines)""")
 parser.add_argument("-w", "--box-width", type=Decimal, default=Decimal(3), help="""set the width of each practice box in nib widths (the distance between slant guide lines; default is 3; has no effect if -s is 90)""")
+parser.add_argument("-j", "--jobs", type=int, default=1, help="""the number of page sizes to process concurrently in streaming mode (default: 1)""")
 parser.add_argument("-p", "--public-domain-dedication", metavar="AUTHOR", default=None, help="""add a Creative Commons CC0 Public Domain Dedication to the generated image using the specified AUTHOR""")
 parser.add_argument("-r", "--precision", type=int, default=8, help="""numerical precision in digits (default: 8)""")
 parser.add_argument("-R", "--resolution", type=int, default=30, help="""SVG pixels per mm (default: 30)""")
+parser.add_argument("-S", "--stream", action="store_true", default=False, help="""process each page size as soon as it is read from standard input and print one newline-delimited JSON (NDJSON) record for each generated file on standard output as soon as it is finished; each record has the fields "path", "size" (in bytes), "seconds", "status" ("ok", "failed", or "skipped"), "papersize", and "line" (the input line number); rows that are rejected because they are invalid get a "failed" record whose "path" and "size" are null""")
 parser.add_argument("-v", "--verbose", action="store_true", default=False, help="""print processing information on standard error""")
 parser.add_argument("--baseline-thickness", type=Decimal, default=Decimal('0.25'), help="""the thickness of baselines in mm (default is 0.25)""")
 parser.add_argument("--waistline-thickness", type=Decimal, default=Decimal('0.1'), help="""the thickness of waistlines in mm (default is 0.1)""")
@@ -79,6 +58,176 @@ parser.add_argument("--svg-filename-format", default=default_svg_filename_format
 parser.add_argument("--title-format", default=default_title_format, help="""the format for the title of each OpenDocument text file (default: {}); use "{{papersize}}" where you'd like the document's paper size to appear""".format(default_title_format))
 parser.add_argument("nibwidth", type=Decimal, nargs="+", help="""pen nib width in mm""")
 
+# The options that apply to every paper size, in the units of the
+# command-line arguments.  Nothing modifies them.
+Options = collections.namedtuple("Options", ["x_height", "cap_height", "ascender_height", "descender_height", "pen_ladder", "slant_angle", "box_width", "jobs", "public_domain_dedication", "precision", "resolution", "stream", "verbose", "baseline_thickness", "waistline_thickness", "cap_line_thickness", "cap_line_dash_length", "ascender_descender_thickness", "slant_line_thickness", "description_format", "fodt_filename_format", "svg_filename_format", "title_format", "nibwidth"])
+
+def options_from_args(args):
+	return Options(**{field: tuple(args.nibwidth) if field == "nibwidth" else getattr(args, field) for field in Options._fields})
+
+# A paper size read from standard input.  lineno is its line number.
+Paper = collections.namedtuple("Paper", ["lineno", "width", "height", "margin", "name"])
+
+# The outcome of generating one file.  status is "ok", "failed", or "skipped";
+# message describes the problem if status isn't "ok".
+Result = collections.namedtuple("Result", ["path", "status", "seconds", "message"])
+
+# Raised for invalid options or paper sizes.
+class SheetError(Exception):
+	def __init__(self, messages):
+		super().__init__("; ".join(messages))
+		self.messages = messages
+
+def validate(options):
+	messages = []
+	if options.ascender_height <= 0:
+		messages.append("ascender height cannot be zero or negative")
+	if options.descender_height <= 0:
+		messages.append("descender height cannot be zero or negative")
+	if options.x_height <= 0:
+		messages.append("x-height cannot be zero or negative")
+	if options.cap_height <= 0:
+		messages.append("cap height cannot be zero or negative")
+	if options.precision <= 0:
+		messages.append("precision must be positive")
+	if options.slant_angle < 0:
+		messages.append("slant angle cannot be negative")
+	elif options.slant_angle > 90:
+		messages.append("slant angle cannot be greater than 90 degrees")
+	elif options.slant_angle != 90 and options.box_width <= 0:
+		messages.append("box width cannot be zero or negative")
+	if options.resolution <= 0:
+		messages.append("resolution cannot be zero or negative")
+	if options.jobs <= 0:
+		messages.append("the number of jobs must be positive")
+	if options.baseline_thickness <= 0:
+		messages.append("baseline thickness cannot be zero or negative")
+	if options.waistline_thickness <= 0:
+		messages.append("x-height thickness cannot be zero or negative")
+	if options.ascender_descender_thickness <= 0:
+		messages.append("ascender and descender thickness cannot be zero or negative")
+	if options.cap_line_thickness <= 0:
+		messages.append("cap line thickness cannot be zero or negative")
+	if options.slant_line_thickness <= 0:
+		messages.append("slant line thickness cannot be zero or negative")
+	if options.cap_line_dash_length <= 0:
+		messages.append("cap line dash length cannot be zero or negative")
+	def test_format(format, format_name, *args, **kwargs):
+		try:
+			format.format(**kwargs)
+		except KeyError as e:
+			messages.append("{} format string is invalid: it specifies an illegal key {{".format(format_name) + str(e) + """} (try doubling '{' and '}' characters to "{{" and "}}")""")
+	test_format(options.description_format, "OpenDocument description", papersize="a4")
+	test_format(options.svg_filename_format, "SVG file name", nibwidth=2, papersize="a4")
+	test_format(options.fodt_filename_format, "OpenDocument text file name", papersize="a4")
+	test_format(options.title_format, "OpenDocument title", papersize="a4")
+	if any(nw <= 0 for nw in options.nibwidth):
+		messages.append("nib widths must be positive")
+	return messages
+
+# Parse the fields of a line of standard input into a Paper.  Raises
+# SheetError if the fields are invalid.
+def parse_paper(lineno, fields):
+	if len(fields) < 4:
+		raise SheetError(["{0}: expected at least 4 fields, got {1}".format(lineno, len(fields))])
+	messages = []
+	def field_to_decimal(fieldno, field):
+		try:
+			return Decimal(field)
+		except InvalidOperation as e:
+			messages.append("{0}: field {1} is not a number".format(lineno, fieldno))
+			return Decimal(0)
+	paper = Paper(lineno, field_to_decimal(1, fields[0]), field_to_decimal(2, fields[1]), field_to_decimal(3, fields[2]), fields[3])
+	if paper.width <= 0:
+		messages.append("{0}: width must be positive".format(lineno))
+	if paper.height <= 0:
+		messages.append("{0}: height must be positive".format(lineno))
+	if paper.margin < 0:
+		messages.append("{0}: margin must be positive or zero".format(lineno))
+	if paper.margin > paper.width * Decimal(0.5):
+		messages.append("{0}: margin exceeds horizontal page dimensions (i.e., it's too large!)".format(lineno))
+	if paper.margin > paper.height * Decimal(0.5):
+		messages.append("{0}: margin exceeds vertical page dimensions (i.e., it's too large!)".format(lineno))
+	if messages:
+		raise SheetError(messages)
+	return paper
+
+# The paths of the files that generate() writes for paper.
+def output_paths(options, paper):
+	return {options.svg_filename_format.format(nibwidth=nibwidth, papersize=paper.name) for nibwidth in options.nibwidth} | {options.fodt_filename_format.format(papersize=paper.name)}
+
+def no_log(level, msg):
+	pass
+
+# Write the output of generator(params, out) to path.  Returns an error
+# message or None, and removes the file if generation failed.
+def write_file(path, generator, params, error_type):
+	try:
+		with open(path, "w") as out:
+			messages = generator(params, out)
+	except error_type as e:
+		messages = e.messages
+	except OSError as e:
+		return "unable to write {0}: {1}".format(path, e.strerror)
+	if messages:
+		try:
+			os.remove(path)
+		except OSError:
+			pass
+		return "; ".join(messages)
+	return None
+
+def generate_svg(options, paper, nibwidth, imgwidth, imgheight, log=no_log):
+	svgimage = options.svg_filename_format.format(nibwidth=nibwidth, papersize=paper.name)
+	log(3, str(nibwidth) + "mm -- " + svgimage)
+	sheet = svgitalicsheet.Sheet(nib_width=nibwidth, x_height=options.x_height, cap_height=options.cap_height, ascender_height=options.ascender_height, descender_height=options.descender_height, slant_angle=options.slant_angle, pen_ladder=options.pen_ladder, box_width=options.box_width, public_domain_dedication=options.public_domain_dedication, precision=options.precision, baseline_thickness=options.baseline_thickness, waistline_thickness=options.waistline_thickness, cap_line_thickness=options.cap_line_thickness, cap_line_dash_length=options.cap_line_dash_length, ascender_descender_thickness=options.ascender_descender_thickness, slant_line_thickness=options.slant_line_thickness, width=imgwidth, height=imgheight, resolution=Decimal(options.resolution))
+	start = time.monotonic()
+	message = write_file(svgimage, svgitalicsheet.generate, sheet, svgitalicsheet.SheetError)
+	if message:
+		return Result(svgimage, "failed", time.monotonic() - start, "unable to generate SVG image for paper size {0} and nib width {1}: {2}".format(paper.name, nibwidth, message))
+	return Result(svgimage, "ok", time.monotonic() - start, None)
+
+def generate_fodt(options, paper, svgimages, svgerrors, log=no_log):
+	fodtfile = options.fodt_filename_format.format(papersize=paper.name)
+	if svgerrors:
+		return Result(fodtfile, "skipped", 0, "skipping OpenDocument generation for paper size {} due to prior errors".format(paper.name))
+	log(2, "OpenDocument file " + fodtfile)
+	document = fodtitalicsheets.Document(description=options.description_format.format(papersize=paper.name), tolerance=Decimal('0.1'), no_verify=False, public_domain_dedication=options.public_domain_dedication, title=options.title_format.format(papersize=paper.name), units="mm", width=paper.width, height=paper.height, margin=paper.margin, sheetimage=tuple(svgimages))
+	start = time.monotonic()
+	message = write_file(fodtfile, fodtitalicsheets.generate, document, fodtitalicsheets.DocumentError)
+	if message:
+		return Result(fodtfile, "failed", time.monotonic() - start, "unable to generate OpenDocument file for paper size {0}: {1}".format(paper.name, message))
+	return Result(fodtfile, "ok", time.monotonic() - start, None)
+
+# Generate the SVG images and the OpenDocument file for paper, passing each
+# file's Result to report(paper, result) as soon as the file is done.  Returns
+# True if every file was generated.
+def generate(options, paper, report, log=no_log):
+	messages = validate(options)
+	if messages:
+		raise SheetError(messages)
+	with localcontext() as context:
+		context.prec = options.precision
+		imgwidth = paper.width - 2 * paper.margin
+		imgheight = paper.height - 2 * paper.margin
+	log(1, paper.name)
+	svgimages = []
+	svgerrors = False
+	log(2, "SVG images ({}mmx{}mm)".format(imgwidth, imgheight))
+	for nibwidth in options.nibwidth:
+		result = generate_svg(options, paper, nibwidth, imgwidth, imgheight, log)
+		report(paper, result)
+		if result.status == "ok":
+			svgimages.append(result.path)
+		else:
+			svgerrors = True
+	result = generate_fodt(options, paper, svgimages, svgerrors, log)
+	report(paper, result)
+	return not svgerrors and result.status == "ok"
+
+def error(message):
+	sys.stderr.write(os.path.basename(sys.argv[0]) + ": error: " + message + "\n")
+
 if __name__ == "__main__":
 	try:
 		args = parser.parse_args()
@@ -86,102 +235,172 @@ if __name__ == "__main__":
 		error("invalid command line arguments (invalid syntax?)")
 		sys.exit(1)
 
-	if args.ascender_height <= 0:
-		error("ascender height cannot be zero or negative")
-	if args.descender_height <= 0:
-		error("descender height cannot be zero or negative")
-	if args.x_height <= 0:
-		error("x-height cannot be zero or negative")
-	if args.cap_height <= 0:
-		error("cap height cannot be zero or negative")
-	if args.precision <= 0:
-		error("precision must be positive")
-	if args.slant_angle < 0:
-		error("slant angle cannot be negative")
-	elif args.slant_angle > 90:
-		error("slant angle cannot be greater than 90 degrees")
-	elif args.slant_angle != 90 and args.box_width <= 0:
-		error("box width cannot be zero or negative")
-	if args.resolution <= 0:
-		error("resolution cannot be zero or negative")
-	if args.baseline_thickness <= 0:
-		error("baseline thickness cannot be zero or negative")
-	if args.waistline_thickness <= 0:
-		error("x-height thickness cannot be zero or negative")
-	if args.ascender_descender_thickness <= 0:
-		error("ascender and descender thickness cannot be zero or negative")
-	if args.cap_line_thickness <= 0:
-		error("cap line thickness cannot be zero or negative")
-	if args.slant_line_thickness <= 0:
-		error("slant line thickness cannot be zero or negative")
-	if args.cap_line_dash_length <= 0:
-		error("cap line dash length cannot be zero or negative")
-	def test_format(format, format_name, *args, **kwargs):
-		try:
-			format.format(**kwargs)
-		except KeyError as e:
-			error("{} format string is invalid: it specifies an illegal key {{".format(format_name) + str(e) + """} (try doubling '{' and '}' characters to "{{" and "}}")""")
-	test_format(args.description_format, "OpenDocument description", papersize="a4")
-	test_format(args.svg_filename_format, "SVG file name", nibwidth=2, papersize="a4")
-	test_format(args.fodt_filename_format, "OpenDocument text file name", papersize="a4")
-	test_format(args.title_format, "OpenDocument title", papersize="a4")
-	if any(nw <= 0 for nw in args.nibwidth):
-		error("nib widths must be positive")
-	if errors:
+	options = options_from_args(args)
+	messages = validate(options)
+	if messages:
+		for message in messages:
+			error(message)
 		sys.exit(1)
-	if not args.nibwidth:
+	if not options.nibwidth:
 		sys.exit(0)
 
-	getcontext().prec = args.precision
-
+	verbose_lock = threading.Lock()
 	def verbose(level, msg):
-		if args.verbose:
-			sys.stderr.write("=" + "=" * (level * 2) + " " + msg + "\n")
+		if options.verbose:
+			with verbose_lock:
+				sys.stderr.write("=" + "=" * (level * 2) + " " + msg + "\n")
+
+	if options.stream:
+		# Print a result record for each generated (or failed) file as soon
+		# as it's done.  Records from concurrent jobs can complete in any
+		# order, so each one is written whole under a lock.
+		output_lock = threading.Lock()
+		failed = threading.Event()
+		stdout_closed = threading.Event()
+		def report(paper, result):
+			size = None
+			if result.status == "ok":
+				try:
+					size = os.path.getsize(result.path)
+				except OSError:
+					pass
+			else:
+				error(result.message)
+			write_record({"path": result.path, "size": size, "seconds": round(result.seconds, 3), "status": result.status, "papersize": paper.name, "line": paper.lineno})
+		def write_record(record):
+			with output_lock:
+				try:
+					sys.stdout.write(json.dumps(record) + "\n")
+					sys.stdout.flush()
+				except BrokenPipeError:
+					# Nobody is reading the results anymore.  Send
+					# further writes (including the one at exit) to
+					# /dev/null and let the main loop stop.
+					stdout_closed.set()
+					os.dup2(os.open(os.devnull, os.O_WRONLY), sys.stdout.fileno())
+					raise
+
+		# Stop reading standard input while all workers are busy and a few
+		# more page sizes are waiting: This bounds memory use no matter how
+		# long the producer keeps writing.
+		slots = threading.BoundedSemaphore(options.jobs * 2)
+
+		# Rows that write any of the same files (e.g., rows with the same
+		# nickname) must run one after another in input order, so the last
+		# row's files win as in batch mode.  The main loop queues each row's
+		# line number on its paths before submitting it; a job runs once it's
+		# first in every one of its queues.
+		path_queues = {}
+		path_queues_changed = threading.Condition()
+		def queue_paths(lineno, paths):
+			with path_queues_changed:
+				for path in paths:
+					path_queues.setdefault(path, collections.deque()).append(lineno)
+		def job(paper, paths):
+			try:
+				with path_queues_changed:
+					path_queues_changed.wait_for(lambda: all(path_queues[path][0] == paper.lineno for path in paths))
+				try:
+					if not generate(options, paper, report, verbose):
+						failed.set()
+				finally:
+					with path_queues_changed:
+						for path in paths:
+							path_queues[path].popleft()
+							if not path_queues[path]:
+								del path_queues[path]
+						path_queues_changed.notify_all()
+			except BrokenPipeError:
+				failed.set()
+			except Exception as e:
+				error("{0}: unexpected error while generating files for paper size {1}: {2}".format(paper.lineno, paper.name, e))
+				failed.set()
+			finally:
+				slots.release()
+
+		verbose(0, "Reading paper dimensions, margins, and names from standard input and generating files")
+		with ThreadPoolExecutor(max_workers=options.jobs) as executor:
+			try:
+				for lineno, line in enumerate(csv.reader(sys.stdin, delimiter="\t"), start=1):
+					line = list(filter(None, line))
+					if len(line) == 0:
+						continue
+					try:
+						paper = parse_paper(lineno, line)
+					except SheetError as e:
+						for message in e.messages:
+							error(message)
+						failed.set()
+						# Rejected rows get a record without a path
+						# so readers don't wait for them.
+						try:
+							write_record({"path": None, "size": None, "seconds": 0, "status": "failed", "papersize": line[3] if len(line) >= 4 else None, "line": lineno})
+						except BrokenPipeError:
+							break
+						continue
+					verbose(1, paper.name + ": {0}mmx{1}mm with {2}mm margins".format(paper.width, paper.height, paper.margin))
+					try:
+						paths = output_paths(options, paper)
+					except Exception as e:
+						error("{0}: unable to determine output file names for paper size {1}: {2}".format(lineno, paper.name, e))
+						failed.set()
+						try:
+							write_record({"path": None, "size": None, "seconds": 0, "status": "failed", "papersize": paper.name, "line": lineno})
+						except BrokenPipeError:
+							break
+						continue
+					if stdout_closed.is_set():
+						break
+					slots.acquire()
+					if stdout_closed.is_set():
+						slots.release()
+						break
+					queue_paths(lineno, paths)
+					executor.submit(job, paper, paths)
+			except csv.Error as e:
+				error("stdin isn't a tab-delimited file")
+				failed.set()
+		if stdout_closed.is_set():
+			error("standard output was closed: stopping")
+		if failed.is_set():
+			verbose(0, "ERRORS!  Exiting...")
+			sys.exit(2)
+		verbose(0, "Done")
+		sys.exit(0)
+
 	verbose(0, "Reading paper dimensions, margins, and names from standard input")
 	papers = []
+	failed = False
 	try:
 		for lineno, line in enumerate(csv.reader(sys.stdin, delimiter="\t"), start=1):
 			line = list(filter(None, line))
-			if len(line) is 0:
+			if len(line) == 0:
 				continue
-			elif len(line) < 4:
-				error("{0}: expected at least 4 fields, got {1}".format(lineno, len(line)))
-			else:
-				paper = Paper(lineno, line[0], line[1], line[2], line[3])
-				papers.append(paper)
-				verbose(1, paper.name + ": {0}mmx{1}mm with {2}mm margins".format(paper.width, paper.height, paper.margin))
+			try:
+				paper = parse_paper(lineno, line)
+			except SheetError as e:
+				for message in e.messages:
+					error(message)
+				failed = True
+				continue
+			papers.append(paper)
+			verbose(1, paper.name + ": {0}mmx{1}mm with {2}mm margins".format(paper.width, paper.height, paper.margin))
 	except csv.Error as e:
 		error("stdin isn't a tab-delimited file")
-	if errors:
+		failed = True
+	if failed:
 		sys.exit(2)
 	if not papers:
 		sys.exit(0)
 
+	def report(paper, result):
+		if result.status != "ok":
+			error(result.message)
 	verbose(0, "Generating files")
 	for paper in papers:
-		verbose(1, paper.name)
-		imgwidth = paper.width - 2 * paper.margin
-		imgheight = paper.height - 2 * paper.margin
-		svgimages = []
-		svgerrors = False
-		verbose(2, "SVG images ({}mmx{}mm)".format(imgwidth, imgheight))
-		for nibwidth in args.nibwidth:
-			svgimage = args.svg_filename_format.format(nibwidth=nibwidth, papersize=paper.name)
-			verbose(3, str(nibwidth) + "mm -- " + svgimage)
-			if subprocess.call("svgitalicsheet.py -n {0} -x {args.x_height} -c {args.cap_height} -a {args.ascender_height} -d {args.descender_height} -s {args.slant_angle} {1}-w {args.box_width} {2}-r {args.precision} --baseline-thickness {args.baseline_thickness} --waistline-thickness {args.waistline_thickness} --cap-line-thickness {args.cap_line_thickness} --cap-line-dash-length {args.cap_line_dash_length} --ascender-descender-thickness {args.ascender_descender_thickness} --slant-line-thickness {args.slant_line_thickness} {3} {4} {5} >{6}".format(nibwidth, "-l " if args.pen_ladder else "", '-p "{}" '.format(args.public_domain_dedication) if args.public_domain_dedication else "", imgwidth, imgheight, args.resolution, svgimage, args=args), shell=True) != 0:
-				error("svgitalicsheet.py failed for paper size {0} and nib width {1}".format(paper.name, nibwidth))
-				svgerrors = True
-			else:
-				svgimages.append(svgimage)
-		if svgerrors:
-			error("skipping OpenDocument generation for paper size {} due to prior errors".format(paper.name))
-		else:
-			fodtfile = args.fodt_filename_format.format(papersize=paper.name)
-			verbose(2, "OpenDocument file " + fodtfile)
-			if subprocess.call("""fodtitalicsheets.py {}{} -t "{}" {} {} {} {} >{}""".format('-p "{}" '.format(args.public_domain_dedication) if args.public_domain_dedication else "", '-d "{}" '.format(args.description_format.format(papersize=paper.name)) if args.description_format else "", args.title_format.format(papersize=paper.name), paper.width, paper.height, paper.margin, " ".join(svgimages), fodtfile), shell=True) != 0:
-				error("fodtitalicsheets.py failed for paper size {}".format(paper.name))
-	if errors:
+		if not generate(options, paper, report, verbose):
+			failed = True
+	if failed:
 		verbose(0, "ERRORS!  Exiting...")
 		sys.exit(2)
 	verbose(0, "Done")
-
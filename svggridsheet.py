@@ -12,8 +12,9 @@
 # <http://creativecommons.org/publicdomain/zero/1.0/>.
 
 import argparse
+import collections
 import datetime
-from decimal import Decimal, getcontext
+from decimal import Decimal, localcontext
 import math
 import os.path
 import sys
@@ -29,11 +30,90 @@ parser.add_argument("width", type=Decimal, help="""the width of the image in mm"
 parser.add_argument("height", type=Decimal, help="""the height of the image in mm""")
 parser.add_argument("resolution", type=Decimal, help="""SVG pixels per mm""")
 
-errors = False
+# The parameters of a grid image, in the units of the command-line arguments.
+# generate() never modifies them.
+Grid = collections.namedtuple("Grid", ["no_vertical_lines", "public_domain_dedication", "position", "precision", "thickness", "gridsize", "width", "height", "resolution"])
+
+def grid_from_args(args):
+  return Grid(**{field: getattr(args, field) for field in Grid._fields})
+
+# Raised by generate() for an invalid Grid.
+class SheetError(Exception):
+  def __init__(self, messages):
+    super().__init__("; ".join(messages))
+    self.messages = messages
+
+def validate(grid):
+  messages = []
+  if grid.precision <= 0:
+    messages.append("precision must be positive")
+  if grid.width <= 0:
+    messages.append("width cannot be zero or negative")
+  if grid.height <= 0:
+    messages.append("height cannot be zero or negative")
+  if grid.gridsize <= 0:
+    messages.append("grid square width and height cannot be zero or negative")
+  if grid.resolution <= 0:
+    messages.append("resolution cannot be zero or negative")
+  if grid.position not in {"ul", "ur", "c", "bl", "br"}:
+    messages.append("position is not valid")
+  if grid.thickness <= 0:
+    messages.append("thickness cannot be zero or negative")
+  return messages
+
+# Write an SVG image of grid to out.
+def generate(grid, out):
+  messages = validate(grid)
+  if messages:
+    raise SheetError(messages)
+
+  with localcontext() as context:
+    context.prec = grid.precision
+    width = grid.width * grid.resolution
+    height = grid.height * grid.resolution
+    gridsize = grid.gridsize * grid.resolution
+    thickness = grid.thickness * grid.resolution
+
+    out.write("""<?xml version="1.0" encoding="UTF-8" standalone="no"?>
+<svg xmlns:xlink="http://www.w3.org/1999/xlink" xmlns="http://www.w3.org/2000/svg" version="1.1" width="{0}" height="{1}">
+  <title>Grid of {2}mm x {2}mm Squares</title>
+  <desc>This is an image of a grid of {2}mm x {2}mm squares formatted for a {3}mm x {4}mm page (with no margins).""".format(width, height, gridsize / grid.resolution, width / grid.resolution, height / grid.resolution))
+    if grid.public_domain_dedication:
+      out.write("""
+
+Created on {0} by {1}.
+
+To the extent possible under law, {1} has waived all copyright and related or neighboring rights to this image.  You can copy, modify, distribute and perform this image, even for commercial purposes, all without asking permission.  Please see &lt;http://creativecommons.org/publicdomain/zero/1.0/&gt; for more information.""".format(datetime.date.today(), grid.public_domain_dedication.strip()))
+
+    out.write("""</desc>\n""")
+    num_x = math.ceil(width / gridsize) + 1
+    num_y = math.ceil(height / gridsize) + 1
+    start_x = 0
+    start_y = 0
+    grid_width = gridsize * num_x
+    grid_height = gridsize * num_y
+    if grid.position == "ur":
+      start_x = width - grid_width
+    elif grid.position == "c":
+      start_x = (width - grid_width) / 2
+      start_y = (height - grid_height) / 2
+    elif grid.position == "bl":
+      start_y = height - grid_height
+    elif grid.position == "br":
+      start_x = width - grid_width
+      start_y = height - grid_height
+    out.write('  <path d="M{0},{1}'.format(start_x, start_y))
+    if not grid.no_vertical_lines:
+      for x in range(num_x + 1):
+        out.write("v{0}m{1},-{0}".format(grid_height, gridsize))
+      out.write('M{0},{1}'.format(start_x, start_y))
+    for y in range(num_y + 1):
+      out.write("h{0}m-{0},{1}".format(grid_width, gridsize))
+    out.write('" stroke="#000" stroke-width="{0}" fill="none"/>\n'.format(thickness))
+    out.write("</svg>\n")
+
 def error(message):
-  global errors
   sys.stderr.write(os.path.basename(sys.argv[0]) + ": error: " + message + "\n")
-  errors = True
 
 if __name__ == "__main__":
   try:
@@ -42,63 +122,9 @@ if __name__ == "__main__":
     error("invalid command line arguments (invalid syntax?)")
     sys.exit(1)
 
-  if args.precision <= 0:
-    error("precision must be positive")
-  if args.width <= 0:
-    error("width cannot be zero or negative")
-  if args.height <= 0:
-    error("height cannot be zero or negative")
-  if args.gridsize <= 0:
-    error("grid square width and height cannot be zero or negative")
-  if args.resolution <= 0:
-    error("resolution cannot be zero or negative")
-  if args.position not in {"ul", "ur", "c", "bl", "br"}:
-    error("position is not valid")
-  if args.thickness <= 0:
-    error("thickness cannot be zero or negative")
-  if errors:
+  try:
+    generate(grid_from_args(args), sys.stdout)
+  except SheetError as e:
+    for message in e.messages:
+      error(message)
     sys.exit(1)
-
-  getcontext().prec = args.precision
-  args.width *= args.resolution
-  args.height *= args.resolution
-  args.gridsize *= args.resolution
-  args.thickness *= args.resolution
-
-  sys.stdout.write("""<?xml version="1.0" encoding="UTF-8" standalone="no"?>
-<svg xmlns:xlink="http://www.w3.org/1999/xlink" xmlns="http://www.w3.org/2000/svg" version="1.1" width="{0}" height="{1}">
-  <title>Grid of {2}mm x {2}mm Squares</title>
-  <desc>This is an image of a grid of {2}mm x {2}mm squares formatted for a {3}mm x {4}mm page (with no margins).""".format(args.width, args.height, args.gridsize / args.resolution, args.width / args.resolution, args.height / args.resolution))
-  if args.public_domain_dedication:
-    sys.stdout.write("""
-
-Created on {0} by {1}.
-
-To the extent possible under law, {1} has waived all copyright and related or neighboring rights to this image.  You can copy, modify, distribute and perform this image, even for commercial purposes, all without asking permission.  Please see &lt;http://creativecommons.org/publicdomain/zero/1.0/&gt; for more information.""".format(datetime.date.today(), args.public_domain_dedication.strip()))
-
-  sys.stdout.write("""</desc>\n""")
-  num_x = math.ceil(args.width / args.gridsize) + 1
-  num_y = math.ceil(args.height / args.gridsize) + 1
-  start_x = 0
-  start_y = 0
-  grid_width = args.gridsize * num_x
-  grid_height = args.gridsize * num_y
-  if args.position == "ur":
-    start_x = args.width - grid_width
-  elif args.position == "c":
-    start_x = (args.width - grid_width) / 2
-    start_y = (args.height - grid_height) / 2
-  elif args.position == "bl":
-    start_y = args.height - grid_height
-  elif args.position == "br":
-    start_x = args.width - grid_width
-    start_y = args.height - grid_height
-  sys.stdout.write('  <path d="M{0},{1}'.format(start_x, start_y))
-  if not args.no_vertical_lines:
-    for x in range(num_x + 1):
-      sys.stdout.write("v{0}m{1},-{0}".format(grid_height, args.gridsize))
-    sys.stdout.write('M{0},{1}'.format(start_x, start_y))
-  for y in range(num_y + 1):
-    sys.stdout.write("h{0}m-{0},{1}".format(grid_width, args.gridsize))
-  sys.stdout.write('" stroke="#000" stroke-width="{0}" fill="none"/>\n'.format(args.thickness))
-  sys.stdout.write("</svg>\n")
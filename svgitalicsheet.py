@@ -12,8 +12,9 @@
 # <http://creativecommons.org/publicdomain/zero/1.0/>.
 
 import argparse
+import collections
 import datetime
-from decimal import Decimal, getcontext
+from decimal import Decimal, localcontext
 import math
 import os.path
 import sys
@@ -39,151 +40,176 @@ parser.add_argument("width", type=Decimal, help="""the width of the image in mm"
 parser.add_argument("height", type=Decimal, help="""the height of the image in mm""")
 parser.add_argument("resolution", type=Decimal, help="""SVG pixels per mm""")
 
-errors = False
-def error(message):
-	global errors
-	sys.stderr.write(os.path.basename(sys.argv[0]) + ": error: " + message + "\n")
-	errors = True
+# The parameters of a practice sheet.  Dimensions are in mm (except for the
+# nib-width-relative ones, as in the command-line options), just as the user
+# specified them: generate() never modifies them.
+Sheet = collections.namedtuple("Sheet", ["nib_width", "x_height", "cap_height", "ascender_height", "descender_height", "slant_angle", "pen_ladder", "box_width", "public_domain_dedication", "precision", "baseline_thickness", "waistline_thickness", "cap_line_thickness", "cap_line_dash_length", "ascender_descender_thickness", "slant_line_thickness", "width", "height", "resolution"])
 
-if __name__ == "__main__":
-	try:
-		args = parser.parse_args()
-	except Exception:
-		error("invalid command line arguments (invalid syntax?)")
-		sys.exit(1)
+def sheet_from_args(args):
+	return Sheet(**{field: getattr(args, field) for field in Sheet._fields})
 
-	if args.nib_width <= 0:
-		error("nib width cannot be zero or negative")
-	if args.ascender_height <= 0:
-		error("ascender height cannot be zero or negative")
-	if args.descender_height <= 0:
-		error("descender height cannot be zero or negative")
-	if args.x_height <= 0:
-		error("x-height cannot be zero or negative")
-	if args.cap_height <= 0:
-		error("cap height cannot be zero or negative")
-	if args.precision <= 0:
-		error("precision must be positive")
-	if args.slant_angle < 0:
-		error("slant angle cannot be negative")
-	elif args.slant_angle > 90:
-		error("slant angle cannot be greater than 90 degrees")
-	elif args.slant_angle != 90 and args.box_width <= 0:
-		error("box width cannot be zero or negative")
-	if args.width <= 0:
-		error("width cannot be zero or negative")
-	if args.height <= 0:
-		error("height cannot be zero or negative")
-	if args.resolution <= 0:
-		error("resolution cannot be zero or negative")
-	if args.baseline_thickness <= 0:
-		error("baseline thickness cannot be zero or negative")
-	if args.waistline_thickness <= 0:
-		error("x-height thickness cannot be zero or negative")
-	if args.ascender_descender_thickness <= 0:
-		error("ascender and descender thickness cannot be zero or negative")
-	if args.cap_line_thickness <= 0:
-		error("cap line thickness cannot be zero or negative")
-	if args.slant_line_thickness <= 0:
-		error("slant line thickness cannot be zero or negative")
-	if args.cap_line_dash_length <= 0:
-		error("cap line dash length cannot be zero or negative")
-	if errors:
-		sys.exit(1)
+# Raised by generate() for an invalid Sheet or one whose letter box doesn't fit
+# its image.
+class SheetError(Exception):
+	def __init__(self, messages):
+		super().__init__("; ".join(messages))
+		self.messages = messages
 
-	getcontext().prec = args.precision
-	slope = (-1 if args.slant_angle == 0 else (Decimal(math.tan(math.radians(Decimal(90) - args.slant_angle))) if args.slant_angle != 90 else 0))
-	args.width *= args.resolution
-	args.height *= args.resolution
-	upper_height = args.ascender_height + args.x_height
-	if upper_height < args.cap_height:
-		upper_height = args.cap_height
-	lower_height = args.descender_height
-	letter_height = (upper_height + lower_height) * args.nib_width * args.resolution
-	if slope > 0 and letter_height / slope > args.width:
-		error("slant angle is too large for the specified image width: cannot fit even one letter box into the image")
-	if letter_height > args.height:
-		error("letter height is greater than the image's height: cannot fit even one letter box into the image")
-	if errors:
-		sys.exit(1)
+def validate(sheet):
+	messages = []
+	if sheet.nib_width <= 0:
+		messages.append("nib width cannot be zero or negative")
+	if sheet.ascender_height <= 0:
+		messages.append("ascender height cannot be zero or negative")
+	if sheet.descender_height <= 0:
+		messages.append("descender height cannot be zero or negative")
+	if sheet.x_height <= 0:
+		messages.append("x-height cannot be zero or negative")
+	if sheet.cap_height <= 0:
+		messages.append("cap height cannot be zero or negative")
+	if sheet.precision <= 0:
+		messages.append("precision must be positive")
+	if sheet.slant_angle < 0:
+		messages.append("slant angle cannot be negative")
+	elif sheet.slant_angle > 90:
+		messages.append("slant angle cannot be greater than 90 degrees")
+	elif sheet.slant_angle != 90 and sheet.box_width <= 0:
+		messages.append("box width cannot be zero or negative")
+	if sheet.width <= 0:
+		messages.append("width cannot be zero or negative")
+	if sheet.height <= 0:
+		messages.append("height cannot be zero or negative")
+	if sheet.resolution <= 0:
+		messages.append("resolution cannot be zero or negative")
+	if sheet.baseline_thickness <= 0:
+		messages.append("baseline thickness cannot be zero or negative")
+	if sheet.waistline_thickness <= 0:
+		messages.append("x-height thickness cannot be zero or negative")
+	if sheet.ascender_descender_thickness <= 0:
+		messages.append("ascender and descender thickness cannot be zero or negative")
+	if sheet.cap_line_thickness <= 0:
+		messages.append("cap line thickness cannot be zero or negative")
+	if sheet.slant_line_thickness <= 0:
+		messages.append("slant line thickness cannot be zero or negative")
+	if sheet.cap_line_dash_length <= 0:
+		messages.append("cap line dash length cannot be zero or negative")
+	return messages
+
+# Write an SVG image of sheet to out.
+def generate(sheet, out):
+	messages = validate(sheet)
+	if messages:
+		raise SheetError(messages)
 
-	sys.stdout.write("""<?xml version="1.0" encoding="UTF-8" standalone="no"?>
+	with localcontext() as context:
+		context.prec = sheet.precision
+		slope = (-1 if sheet.slant_angle == 0 else (Decimal(math.tan(math.radians(Decimal(90) - sheet.slant_angle))) if sheet.slant_angle != 90 else 0))
+		width = sheet.width * sheet.resolution
+		height = sheet.height * sheet.resolution
+		upper_height = sheet.ascender_height + sheet.x_height
+		if upper_height < sheet.cap_height:
+			upper_height = sheet.cap_height
+		lower_height = sheet.descender_height
+		letter_height = (upper_height + lower_height) * sheet.nib_width * sheet.resolution
+		if slope > 0 and letter_height / slope > width:
+			messages.append("slant angle is too large for the specified image width: cannot fit even one letter box into the image")
+		if letter_height > height:
+			messages.append("letter height is greater than the image's height: cannot fit even one letter box into the image")
+		if messages:
+			raise SheetError(messages)
+
+		out.write("""<?xml version="1.0" encoding="UTF-8" standalone="no"?>
 <svg xmlns:xlink="http://www.w3.org/1999/xlink" xmlns="http://www.w3.org/2000/svg" version="1.1" width="{0}" height="{1}">
 	<title>Italic Calligraphy Practice Sheet</title>
-	<desc>This is an Italic calligraphy practice grid for nib widths of {2}mm.  {3}The x-height is {4} nib widths.  Ascenders are {5} nib widths, descenders are {6} nib widths, and the cap height is {7} nib widths.  This is formatted for a {8}mm x {9}mm page (with no margins).""".format(args.width, args.height, args.nib_width, """There are {:g}-degree slant guide lines every {} nib widths.  """.format(args.slant_angle, args.box_width) if slope != 0 else "", args.x_height, args.ascender_height, args.descender_height, args.cap_height, args.width / args.resolution, args.height / args.resolution))
-	if args.public_domain_dedication:
-		sys.stdout.write("""
+	<desc>This is an Italic calligraphy practice grid for nib widths of {2}mm.  {3}The x-height is {4} nib widths.  Ascenders are {5} nib widths, descenders are {6} nib widths, and the cap height is {7} nib widths.  This is formatted for a {8}mm x {9}mm page (with no margins).""".format(width, height, sheet.nib_width, """There are {:g}-degree slant guide lines every {} nib widths.  """.format(sheet.slant_angle, sheet.box_width) if slope != 0 else "", sheet.x_height, sheet.ascender_height, sheet.descender_height, sheet.cap_height, width / sheet.resolution, height / sheet.resolution))
+		if sheet.public_domain_dedication:
+			out.write("""
 
 Created on {0} by {1}.
 
-To the extent possible under law, {1} has waived all copyright and related or neighboring rights to this image.  You can copy, modify, distribute and perform this image, even for commercial purposes, all without asking permission.  Please see &lt;http://creativecommons.org/publicdomain/zero/1.0/&gt; for more information.""".format(datetime.date.today(), args.public_domain_dedication.strip()))
-
-	args.nib_width = args.nib_width * args.resolution
-	args.box_width = args.box_width * args.nib_width
-	args.x_height = args.x_height * args.nib_width
-	args.ascender_height = args.ascender_height * args.nib_width
-	args.descender_height = args.descender_height * args.nib_width
-	args.cap_height = args.cap_height * args.nib_width
-	args.baseline_thickness *= args.resolution
-	args.waistline_thickness *= args.resolution
-	args.ascender_descender_thickness *= args.resolution
-	args.cap_line_thickness *= args.resolution
-	args.slant_line_thickness *= args.resolution
-	args.cap_line_dash_length *= args.nib_width
-	cap_diff = args.ascender_height + args.x_height - args.cap_height
-
-	sys.stdout.write("""</desc>\n	<defs>\n""")
-	if args.pen_ladder:
-		sys.stdout.write("""		<rect id="pl" width="{0}" height="{0}" fill="#000" stroke="none"/>\n""".format(args.nib_width))
-	sys.stdout.write("""		<g id="l" stroke="#000">\n""")
-	if slope == -1:
-		# Vertical guide lines
-		sl_str = """m{0},-{1}v{1}""".format(args.box_width, letter_height)
-		sys.stdout.write("""			<path d="m0,0v{}""".format(letter_height))
-		x = args.box_width
-		while x <= args.width:
-			sys.stdout.write(sl_str)
-			x = x + args.box_width
-		sys.stdout.write("""\" fill="none" stroke-width="{}"/>\n""".format(args.slant_line_thickness))
-	elif slope > 0:
-		# Slanted guide lines
-		slopedlinewidth = letter_height / slope
-		x_start = (slopedlinewidth / args.box_width - Decimal(int(slopedlinewidth / args.box_width))) * args.box_width
-		sl_str = """m{0},-{1}l-{2},{1}""".format(args.box_width + slopedlinewidth, letter_height, slopedlinewidth)
-		sys.stdout.write("			<path d=\"m{0},0l-{1},{2}".format(x_start, slopedlinewidth, letter_height))
-		x = x_start + args.box_width
-		end = args.width + slopedlinewidth
-		while x < end:
-			sys.stdout.write(sl_str)
-			x = x + args.box_width
-		sys.stdout.write("""\" fill="none" stroke-width="{}"/>\n""".format(args.slant_line_thickness))
-	if cap_diff >= 0:
-		sys.stdout.write("""			<line id="adl" x2="{0}" stroke-width="{5}"/>
+To the extent possible under law, {1} has waived all copyright and related or neighboring rights to this image.  You can copy, modify, distribute and perform this image, even for commercial purposes, all without asking permission.  Please see &lt;http://creativecommons.org/publicdomain/zero/1.0/&gt; for more information.""".format(datetime.date.today(), sheet.public_domain_dedication.strip()))
+
+		nib_width = sheet.nib_width * sheet.resolution
+		box_width = sheet.box_width * nib_width
+		x_height = sheet.x_height * nib_width
+		ascender_height = sheet.ascender_height * nib_width
+		cap_height = sheet.cap_height * nib_width
+		baseline_thickness = sheet.baseline_thickness * sheet.resolution
+		waistline_thickness = sheet.waistline_thickness * sheet.resolution
+		ascender_descender_thickness = sheet.ascender_descender_thickness * sheet.resolution
+		cap_line_thickness = sheet.cap_line_thickness * sheet.resolution
+		slant_line_thickness = sheet.slant_line_thickness * sheet.resolution
+		cap_line_dash_length = sheet.cap_line_dash_length * nib_width
+		cap_diff = ascender_height + x_height - cap_height
+
+		out.write("""</desc>\n	<defs>\n""")
+		if sheet.pen_ladder:
+			out.write("""		<rect id="pl" width="{0}" height="{0}" fill="#000" stroke="none"/>\n""".format(nib_width))
+		out.write("""		<g id="l" stroke="#000">\n""")
+		if slope == -1:
+			# Vertical guide lines
+			sl_str = """m{0},-{1}v{1}""".format(box_width, letter_height)
+			out.write("""			<path d="m0,0v{}""".format(letter_height))
+			x = box_width
+			while x <= width:
+				out.write(sl_str)
+				x = x + box_width
+			out.write("""\" fill="none" stroke-width="{}"/>\n""".format(slant_line_thickness))
+		elif slope > 0:
+			# Slanted guide lines
+			slopedlinewidth = letter_height / slope
+			x_start = (slopedlinewidth / box_width - Decimal(int(slopedlinewidth / box_width))) * box_width
+			sl_str = """m{0},-{1}l-{2},{1}""".format(box_width + slopedlinewidth, letter_height, slopedlinewidth)
+			out.write("			<path d=\"m{0},0l-{1},{2}".format(x_start, slopedlinewidth, letter_height))
+			x = x_start + box_width
+			end = width + slopedlinewidth
+			while x < end:
+				out.write(sl_str)
+				x = x + box_width
+			out.write("""\" fill="none" stroke-width="{}"/>\n""".format(slant_line_thickness))
+		if cap_diff >= 0:
+			out.write("""			<line id="adl" x2="{0}" stroke-width="{5}"/>
 			<line y1="{1}" x2="{0}" y2="{1}" stroke-width="{6}" stroke-dasharray="{7} {7}"/>
 			<line y1="{2}" x2="{0}" y2="{2}" stroke-width="{8}"/>
 			<line y1="{3}" x2="{0}" y2="{3}" stroke-width="{9}"/>
-			<use xlink:href="#adl" y="{4}"/>\n""".format(args.width, cap_diff, args.ascender_height, args.ascender_height + args.x_height, letter_height, args.ascender_descender_thickness, args.cap_line_thickness, args.cap_line_dash_length, args.waistline_thickness, args.baseline_thickness))
-	else:
-		# Cap line is above the ascender line
-		sys.stdout.write("""			<line id="cl" x2="{0}" stroke-width="{5}" stroke-dasharray="{6} {6}"/>
+			<use xlink:href="#adl" y="{4}"/>\n""".format(width, cap_diff, ascender_height, ascender_height + x_height, letter_height, ascender_descender_thickness, cap_line_thickness, cap_line_dash_length, waistline_thickness, baseline_thickness))
+		else:
+			# Cap line is above the ascender line
+			out.write("""			<line id="cl" x2="{0}" stroke-width="{5}" stroke-dasharray="{6} {6}"/>
 			<line y1="{1}" x2="{0}" y2="{1}" stroke-width="{7}"/>
 			<line y1="{2}" x2="{0}" y2="{2}" stroke-width="{8}"/>
 			<line y1="{3}" x2="{0}" y2="{3}" stroke-width="{9}"/>
-			<use xlink:href="#cl" y="{4}"/>\n""".format(args.width, -cap_diff, args.ascender_height - cap_diff, args.cap_height, letter_height, args.cap_line_thickness, args.cap_line_dash_length, args.ascender_descender_thickness, args.waistline_thickness, args.baseline_thickness))
-	if args.pen_ladder:
-		pen_ladder_height = Decimal(int(upper_height) + int(lower_height)) * args.nib_width
-		ladder_y_offset = (upper_height - Decimal(int(upper_height))) * args.nib_width
-		ladder_y = Decimal(0)
-		x = Decimal(0)
-		while ladder_y < pen_ladder_height:
-			sys.stdout.write("""			<use xlink:href="#pl" x="{}" y="{}"/>\n""".format((x % 2 - Decimal('0.5')) * args.nib_width, ladder_y_offset + ladder_y))
-			x = x + Decimal(1)
-			ladder_y = ladder_y + args.nib_width
-	sys.stdout.write("""		</g>\n	</defs>\n""")
-
-	y = Decimal(0)
-	while y < args.height:
-		sys.stdout.write("""	<use xlink:href="#l" y="{}"/>\n""".format(y))
-		y = y + letter_height
-	sys.stdout.write("</svg>\n")
+			<use xlink:href="#cl" y="{4}"/>\n""".format(width, -cap_diff, ascender_height - cap_diff, cap_height, letter_height, cap_line_thickness, cap_line_dash_length, ascender_descender_thickness, waistline_thickness, baseline_thickness))
+		if sheet.pen_ladder:
+			pen_ladder_height = Decimal(int(upper_height) + int(lower_height)) * nib_width
+			ladder_y_offset = (upper_height - Decimal(int(upper_height))) * nib_width
+			ladder_y = Decimal(0)
+			x = Decimal(0)
+			while ladder_y < pen_ladder_height:
+				out.write("""			<use xlink:href="#pl" x="{}" y="{}"/>\n""".format((x % 2 - Decimal('0.5')) * nib_width, ladder_y_offset + ladder_y))
+				x = x + Decimal(1)
+				ladder_y = ladder_y + nib_width
+		out.write("""		</g>\n	</defs>\n""")
 
+		y = Decimal(0)
+		while y < height:
+			out.write("""	<use xlink:href="#l" y="{}"/>\n""".format(y))
+			y = y + letter_height
+		out.write("</svg>\n")
+
+def error(message):
+	sys.stderr.write(os.path.basename(sys.argv[0]) + ": error: " + message + "\n")
+
+if __name__ == "__main__":
+	try:
+		args = parser.parse_args()
+	except Exception:
+		error("invalid command line arguments (invalid syntax?)")
+		sys.exit(1)
+
+	try:
+		generate(sheet_from_args(args), sys.stdout)
+	except SheetError as e:
+		for message in e.messages:
+			error(message)
+		sys.exit(1)
@@ -12,8 +12,9 @@
 # <http://creativecommons.org/publicdomain/zero/1.0/>.
 
 import argparse
+import collections
 import datetime
-from decimal import Decimal, getcontext
+from decimal import Decimal, localcontext
 import math
 import os.path
 import sys
@@ -28,11 +29,85 @@ parser.add_argument("width", type=Decimal, help="""the width of the image in mm"
 parser.add_argument("height", type=Decimal, help="""the height of the image in mm""")
 parser.add_argument("resolution", type=Decimal, help="""SVG pixels per mm""")
 
-errors = False
+# The parameters of a slant guide sheet, in the units of the command-line
+# arguments.  generate() never modifies them.
+SlantSheet = collections.namedtuple("SlantSheet", ["public_domain_dedication", "precision", "thickness", "angle", "space", "width", "height", "resolution"])
+
+def sheet_from_args(args):
+	return SlantSheet(**{field: getattr(args, field) for field in SlantSheet._fields})
+
+# Raised by generate() for an invalid SlantSheet.
+class SheetError(Exception):
+	def __init__(self, messages):
+		super().__init__("; ".join(messages))
+		self.messages = messages
+
+def validate(sheet):
+	messages = []
+	if sheet.precision <= 0:
+		messages.append("precision must be positive")
+	if sheet.angle < 0:
+		messages.append("angle cannot be negative")
+	elif sheet.angle > 90:
+		messages.append("angle must be less than 90 degrees")
+	if sheet.space <= 0:
+		messages.append("space must be positive")
+	if sheet.width <= 0:
+		messages.append("width cannot be zero or negative")
+	if sheet.height <= 0:
+		messages.append("height cannot be zero or negative")
+	if sheet.resolution <= 0:
+		messages.append("resolution cannot be zero or negative")
+	if sheet.thickness <= 0:
+		messages.append("line thickness must be positive")
+	return messages
+
+# Write an SVG image of sheet to out.
+def generate(sheet, out):
+	messages = validate(sheet)
+	if messages:
+		raise SheetError(messages)
+
+	with localcontext() as context:
+		context.prec = sheet.precision
+		out.write("""<?xml version="1.0" encoding="UTF-8" standalone="no"?>
+<svg xmlns:xlink="http://www.w3.org/1999/xlink" xmlns="http://www.w3.org/2000/svg" version="1.1" width="{0}" height="{1}">
+	<title>Italic Calligraphy Slant Line Guide Sheet</title>
+	<desc>This is an Italic calligraphy guide sheet with slant lines at {2} degrees every {3}mm.  This is formatted for a {4}mm x {5}mm page (with no margins).""".format(sheet.width * sheet.resolution, sheet.height * sheet.resolution, sheet.angle, sheet.space, sheet.width, sheet.height))
+		if sheet.public_domain_dedication:
+			out.write("""
+
+Created on {0} by {1}.
+
+To the extent possible under law, {1} has waived all copyright and related or neighboring rights to this image.  You can copy, modify, distribute and perform this image, even for commercial purposes, all without asking permission.  Please see &lt;http://creativecommons.org/publicdomain/zero/1.0/&gt; for more information.""".format(datetime.date.today(), sheet.public_domain_dedication.strip()))
+
+		slope = (-1 if sheet.angle == 0 else Decimal(math.tan(math.radians(Decimal(90) - sheet.angle))))
+		width = sheet.width * sheet.resolution
+		height = sheet.height * sheet.resolution
+		space = sheet.space * sheet.resolution
+		thickness = sheet.thickness * sheet.resolution
+
+		out.write("""</desc>\n""")
+		if slope == -1:
+			# Vertical guide lines
+			sl_str = """v{0}m{1},-{0}""".format(height, space)
+			x = 0
+			end = width
+		else:
+			# Slanted guide lines
+			slant_width = height / slope
+			sl_str = """l-{0},{1}m{2},-{1}""".format(slant_width, height, space + slant_width)
+			x = space
+			end = width + slant_width
+		out.write("""	<path d="m{0},0""".format(x))
+		while x <= end:
+			out.write(sl_str)
+			x += space
+		out.write("""\" stroke="#000" fill="none" stroke-width="{}"/>
+</svg>\n""".format(thickness))
+
 def error(message):
-	global errors
 	sys.stderr.write(os.path.basename(sys.argv[0]) + ": error: " + message + "\n")
-	errors = True
 
 if __name__ == "__main__":
 	try:
@@ -41,61 +116,9 @@ if __name__ == "__main__":
 		error("invalid command line arguments (invalid syntax?)")
 		sys.exit(1)
 
-	if args.precision <= 0:
-		error("precision must be positive")
-	if args.angle < 0:
-		error("angle cannot be negative")
-	elif args.angle > 90:
-		error("angle must be less than 90 degrees")
-	if args.space <= 0:
-		error("space must be positive")
-	if args.width <= 0:
-		error("width cannot be zero or negative")
-	if args.height <= 0:
-		error("height cannot be zero or negative")
-	if args.resolution <= 0:
-		error("resolution cannot be zero or negative")
-	if args.thickness <= 0:
-		error("line thickness must be positive")
-	if errors:
+	try:
+		generate(sheet_from_args(args), sys.stdout)
+	except SheetError as e:
+		for message in e.messages:
+			error(message)
 		sys.exit(1)
-
-	getcontext().prec = args.precision
-
-	sys.stdout.write("""<?xml version="1.0" encoding="UTF-8" standalone="no"?>
-<svg xmlns:xlink="http://www.w3.org/1999/xlink" xmlns="http://www.w3.org/2000/svg" version="1.1" width="{0}" height="{1}">
-	<title>Italic Calligraphy Slant Line Guide Sheet</title>
-	<desc>This is an Italic calligraphy guide sheet with slant lines at {2} degrees every {3}mm.  This is formatted for a {4}mm x {5}mm page (with no margins).""".format(args.width * args.resolution, args.height * args.resolution, args.angle, args.space, args.width, args.height))
-	if args.public_domain_dedication:
-		sys.stdout.write("""
-
-Created on {0} by {1}.
-
-To the extent possible under law, {1} has waived all copyright and related or neighboring rights to this image.  You can copy, modify, distribute and perform this image, even for commercial purposes, all without asking permission.  Please see &lt;http://creativecommons.org/publicdomain/zero/1.0/&gt; for more information.""".format(datetime.date.today(), args.public_domain_dedication.strip()))
-
-	slope = (-1 if args.angle == 0 else Decimal(math.tan(math.radians(Decimal(90) - args.angle))))
-	args.width *= args.resolution
-	args.height *= args.resolution
-	args.space *= args.resolution
-	args.thickness *= args.resolution
-
-	sys.stdout.write("""</desc>\n""")
-	if slope == -1:
-		# Vertical guide lines
-		sl_str = """v{0}m{1},-{0}""".format(args.height, args.space)
-		x = 0
-		end = args.width
-		sys.stdout.write("""	<path d="m0,0v{}""".format(letter_height))
-	else:
-		# Slanted guide lines
-		slant_width = args.height / slope
-		sl_str = """l-{0},{1}m{2},-{1}""".format(slant_width, args.height, args.space + slant_width)
-		x = args.space
-		end = args.width + slant_width
-	sys.stdout.write("""	<path d="m{0},0""".format(x))
-	while x <= end:
-		sys.stdout.write(sl_str)
-		x += args.space
-	sys.stdout.write("""\" stroke="#000" fill="none" stroke-width="{}"/>
-</svg>\n""".format(args.thickness))
-